@@ -9,18 +9,44 @@ import os
 import json
 from pathlib import Path
 
+# Get actual CrewAI storage location (resolved once at import)
+try:
+    from crewai.utilities.paths import db_storage_path
+    MEMORY_DIR = Path(db_storage_path())
+except Exception:
+    # Fallback to local db if import fails
+    MEMORY_DIR = Path("db")
+
+LTM_DB = MEMORY_DIR / "long_term_memory_storage.db"
+TASK_DB = MEMORY_DIR / "latest_kickoff_task_outputs.db"
+
+# Memory directories: (path, directory name, description)
+MEMORY_TYPE_DIRS = [
+    (MEMORY_DIR / "short_term", "short_term", "Short-Term Memory (ChromaDB)"),
+    (MEMORY_DIR / "entities", "entities", "Entity Memory (ChromaDB)"),
+    (MEMORY_DIR / "long_term_memory", "long_term_memory", "Long-Term Memory (ChromaDB)"),
+]
+
+def _scandir_count(path):
+    """Count regular files under path without building a list of Paths."""
+    count = 0
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_symlink():
+                    continue
+                if entry.is_file(follow_symlinks=False):
+                    count += 1
+                elif entry.is_dir(follow_symlinks=False):
+                    count += _scandir_count(entry.path)
+    except PermissionError:
+        pass
+    return count
+
 def inspect_memory():
     """Display contents of CrewAI memory storage."""
     
-    # Get actual CrewAI storage location
-    try:
-        from crewai.utilities.paths import db_storage_path
-        memory_dir = Path(db_storage_path())
-    except:
-        # Fallback to local db if import fails
-        memory_dir = Path("db")
-    
-    if not memory_dir.exists():
+    if not MEMORY_DIR.exists():
         print("\nNo memory storage found yet.")
         print("Run main.py and have a conversation first!\n")
         return
@@ -29,48 +55,40 @@ def inspect_memory():
     print("CrewAI Memory Storage Inspector")
     print("="*70 + "\n")
     
-    print(f"Storage Location: {memory_dir}\n")
+    print(f"Storage Location: {MEMORY_DIR}\n")
     
     # Check for long-term memory database
-    ltm_db = memory_dir / "long_term_memory_storage.db"
-    if ltm_db.exists():
-        size_kb = ltm_db.stat().st_size / 1024
+    if LTM_DB.exists():
+        size_kb = LTM_DB.stat().st_size / 1024
         print(f"Long-Term Memory Database:")
-        print(f"  File: {ltm_db.name}")
+        print(f"  File: {LTM_DB.name}")
         print(f"  Size: {size_kb:.2f} KB")
         
         try:
             import sqlite3
-            conn = sqlite3.connect(str(ltm_db))
+            # Read-only URI so inspecting never creates journal/WAL files
+            conn = sqlite3.connect(f"file:{LTM_DB}?mode=ro", uri=True)
+            conn.execute("PRAGMA query_only=1")
             cursor = conn.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-            tables = cursor.fetchall()
-            print(f"  Tables: {len(tables)}")
+            cursor.execute("SELECT count(*) FROM sqlite_master WHERE type='table'")
+            table_count = cursor.fetchone()[0]
+            print(f"  Tables: {table_count}")
             conn.close()
         except:
             pass
     
     # Check task outputs database
-    task_db = memory_dir / "latest_kickoff_task_outputs.db"
-    if task_db.exists():
-        size_kb = task_db.stat().st_size / 1024
+    if TASK_DB.exists():
+        size_kb = TASK_DB.stat().st_size / 1024
         print(f"\nTask Outputs Database:")
-        print(f"  File: {task_db.name}")
+        print(f"  File: {TASK_DB.name}")
         print(f"  Size: {size_kb:.2f} KB")
     
     # Check memory directories
-    memory_types = {
-        "short_term": "Short-Term Memory (ChromaDB)",
-        "entities": "Entity Memory (ChromaDB)", 
-        "long_term_memory": "Long-Term Memory (ChromaDB)"
-    }
-    
     print("\nMemory Directories:")
-    for dir_name, description in memory_types.items():
-        dir_path = memory_dir / dir_name
+    for dir_path, dir_name, description in MEMORY_TYPE_DIRS:
         if dir_path.exists():
-            files = list(dir_path.rglob("*"))
-            file_count = len([f for f in files if f.is_file()])
+            file_count = _scandir_count(dir_path)
             print(f"  {description}:")
             print(f"    Location: {dir_name}/")
             print(f"    Files: {file_count}")
@@ -86,17 +104,21 @@ def inspect_memory():
     print("\nNote: Memory is stored as vector embeddings and SQLite databases")
     print("="*70 + "\n")
 
+def print_embedding_cache_stats(stats):
+    """Display hit/miss counts from the agent's embedding cache (see main.py)."""
+    hits, misses = stats["hits"], stats["misses"]
+    total = hits + misses
+    hit_ratio = hits / total if total else 0.0
+    
+    print("\nEmbedding Cache (this session):")
+    print(f"  Lookups: {total}")
+    print(f"  Hits: {hits} ({hit_ratio:.0%})")
+    print(f"  Misses: {misses}")
+
 def clear_memory():
     """Clear all stored memory (use with caution!)."""
     
-    # Get actual CrewAI storage location
-    try:
-        from crewai.utilities.paths import db_storage_path
-        memory_dir = Path(db_storage_path())
-    except:
-        memory_dir = Path("db")
-    
-    if not memory_dir.exists():
+    if not MEMORY_DIR.exists():
         print("\nNo memory to clear.\n")
         return
     
@@ -104,7 +126,7 @@ def clear_memory():
     
     if response.lower() == 'yes':
         import shutil
-        shutil.rmtree(memory_dir)
+        shutil.rmtree(MEMORY_DIR)
         print("\nMemory cleared! Agent will start fresh next time.\n")
     else:
         print("\nCancelled.\n")
@@ -11,16 +11,23 @@ Students: Follow the steps to add memory and tools to your agent!
 """
 
 from crewai import Agent, Task, Crew, LLM
-from crewai.tools import BaseTool
+from crewai.memory import ShortTermMemory
 from crewai_tools import DirectoryReadTool, FileReadTool, SerperDevTool, WebsiteSearchTool, YoutubeVideoSearchTool
-from pydantic import BaseModel, Field
-from typing import Type
+from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+from pydantic import PrivateAttr
+from collections import Counter, OrderedDict
 from dotenv import load_dotenv
+import logging
 import os
-from openai import OpenAI
+import threading
+import uuid
+
+from inspect_memory import print_embedding_cache_stats
 
 load_dotenv()
 
+SERPER_API_KEY = os.getenv('SERPER_API_KEY')
+
 # ==============================================================================
 # STEP 1: Configure your LLM (same as Day 1)
 # ==============================================================================
@@ -52,227 +59,31 @@ youtube_tool = YoutubeVideoSearchTool()
 
 # Tool 5: Web Search (requires SERPER_API_KEY in .env)
 # Get free key at: https://serper.dev
-search_tool = None
-if os.getenv('SERPER_API_KEY'):
-    search_tool = SerperDevTool()
-
-# ==============================================================================
-# STEP 3: Create Custom Tool
-# ==============================================================================
-
-class CalculatorInput(BaseModel):
-    """Input schema for Calculator tool."""
-    expression: str = Field(..., description="Mathematical expression to evaluate")
-
-class CalculatorTool(BaseTool):
-    name: str = "calculator"
-    description: str = "Performs mathematical calculations. Use for any math operations."
-    args_schema: Type[BaseModel] = CalculatorInput
-
-    def _run(self, expression: str) -> str:
-        """Execute the calculation."""
-        try:
-            result = eval(expression, {"__builtins__": {}}, {})
-            return f"Result: {result}"
-        except Exception as e:
-            return f"Error: {str(e)}"
-
-calculator_tool = CalculatorTool()
-
-# ==============================================================================
-# CUSTOM TOOL: Image Generation
-# ==============================================================================
-
-class ImageGenerationInput(BaseModel):
-    """Input schema for Image Generation tool."""
-    prompt: str = Field(..., description="Detailed description of the image to generate")
-
-class ImageGenerationTool(BaseTool):
-    name: str = "image_generator"
-    description: str = "Generates an image based on a text description using DALL-E 3. Use this when asked to create, generate, or draw an image."
-    args_schema: Type[BaseModel] = ImageGenerationInput
-
-    def _run(self, prompt: str) -> str:
-        """Generate an image using DALL-E."""
-        try:
-            client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-            response = client.images.generate(
-                model="dall-e-3",
-                prompt=prompt,
-                size="1024x1024",
-                quality="standard",
-                n=1,
-            )
-
-            image_url = response.data[0].url
-            revised_prompt = response.data[0].revised_prompt
-
-            return f"✅ Image generated successfully!\n\nImage URL: {image_url}\n\nRevised prompt used: {revised_prompt}\n\nYou can view the image by opening the URL in your browser."
-        except Exception as e:
-            return f"❌ Error generating image: {str(e)}\n\nMake sure your OPENAI_API_KEY is set and has available credits."
-
-image_tool = ImageGenerationTool()
+search_tool = SerperDevTool() if SERPER_API_KEY else None
 
 # ==============================================================================
-# MULTIMODAL TOOLS: Vision, Audio, Documents
+# STEP 3: Custom Tools (defined in tools.py)
 # ==============================================================================
 
-# VISION: Image Analysis Tool (GPT-4 Vision)
-class ImageAnalysisInput(BaseModel):
-    """Input schema for Image Analysis tool."""
-    image_url: str = Field(..., description="URL of the image to analyze")
-    question: str = Field(default="What's in this image?", description="Specific question about the image")
-
-class ImageAnalysisTool(BaseTool):
-    name: str = "analyze_image"
-    description: str = "Analyzes images using GPT-4 Vision. Can describe images, identify objects, read text in images (OCR), and answer questions about visual content. Provide an image URL."
-    args_schema: Type[BaseModel] = ImageAnalysisInput
-
-    def _run(self, image_url: str, question: str = "What's in this image? Describe it in detail.") -> str:
-        """Analyze an image using GPT-4 Vision."""
-        try:
-            client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-            
-            response = client.chat.completions.create(
-                model="gpt-4o",  # GPT-4 with vision capabilities
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": question
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {"url": image_url}
-                            }
-                        ]
-                    }
-                ],
-                max_tokens=500
-            )
-            
-            analysis = response.choices[0].message.content
-            return f"🔍 Image Analysis:\n\n{analysis}"
-        except Exception as e:
-            return f"❌ Error analyzing image: {str(e)}"
-
-vision_tool = ImageAnalysisTool()
-
-# AUDIO: Speech-to-Text Tool (Whisper)
-class SpeechToTextInput(BaseModel):
-    """Input schema for Speech-to-Text tool."""
-    audio_file_path: str = Field(..., description="Path to audio file (mp3, wav, m4a, etc.)")
-
-class SpeechToTextTool(BaseTool):
-    name: str = "transcribe_audio"
-    description: str = "Converts speech/audio to text using Whisper. Supports mp3, wav, m4a, and other audio formats."
-    args_schema: Type[BaseModel] = SpeechToTextInput
-
-    def _run(self, audio_file_path: str) -> str:
-        """Transcribe audio to text using Whisper."""
-        try:
-            client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-            
-            with open(audio_file_path, "rb") as audio_file:
-                transcript = client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file
-                )
-            
-            return f"🎤 Transcription:\n\n{transcript.text}"
-        except Exception as e:
-            return f"❌ Error transcribing audio: {str(e)}\n\nMake sure the audio file exists at: {audio_file_path}"
-
-speech_to_text_tool = SpeechToTextTool()
-
-# AUDIO: Text-to-Speech Tool (OpenAI TTS)
-class TextToSpeechInput(BaseModel):
-    """Input schema for Text-to-Speech tool."""
-    text: str = Field(..., description="Text to convert to speech")
-    voice: str = Field(default="nova", description="Voice to use: alloy, echo, fable, onyx, nova, shimmer")
-    output_file: str = Field(default="speech_output.mp3", description="Output filename for the audio")
-
-class TextToSpeechTool(BaseTool):
-    name: str = "text_to_speech"
-    description: str = "Converts text to natural-sounding speech audio. Choose from voices: alloy, echo, fable, onyx, nova (default), shimmer."
-    args_schema: Type[BaseModel] = TextToSpeechInput
-
-    def _run(self, text: str, voice: str = "nova", output_file: str = "speech_output.mp3") -> str:
-        """Convert text to speech using OpenAI TTS."""
-        try:
-            client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-            
-            response = client.audio.speech.create(
-                model="tts-1",
-                voice=voice,
-                input=text
-            )
-            
-            response.stream_to_file(output_file)
-            return f"🔊 Audio generated successfully!\n\nSaved to: {output_file}\nVoice: {voice}\nText: {text[:100]}..."
-        except Exception as e:
-            return f"❌ Error generating speech: {str(e)}"
-
-text_to_speech_tool = TextToSpeechTool()
-
-# DOCUMENTS: PDF Analysis Tool
-class PDFAnalysisInput(BaseModel):
-    """Input schema for PDF Analysis tool."""
-    pdf_path: str = Field(..., description="Path to PDF file to analyze")
-
-class PDFAnalysisTool(BaseTool):
-    name: str = "analyze_pdf"
-    description: str = "Reads and extracts text from PDF documents. Can analyze PDFs, extract content, and answer questions about PDF files."
-    args_schema: Type[BaseModel] = PDFAnalysisInput
-
-    def _run(self, pdf_path: str) -> str:
-        """Analyze a PDF document."""
-        try:
-            import pdfplumber
-            
-            text_content = ""
-            page_count = 0
-            
-            with pdfplumber.open(pdf_path) as pdf:
-                page_count = len(pdf.pages)
-                for page in pdf.pages:
-                    text_content += page.extract_text() + "\n\n"
-            
-            # Limit output size
-            if len(text_content) > 3000:
-                text_content = text_content[:3000] + "\n\n[Content truncated - PDF is longer]"
-            
-            return f"📄 PDF Analysis:\n\nPages: {page_count}\n\nContent:\n{text_content}"
-        except FileNotFoundError:
-            return f"❌ Error: PDF file not found at {pdf_path}"
-        except Exception as e:
-            return f"❌ Error analyzing PDF: {str(e)}"
-
-pdf_tool = PDFAnalysisTool()
+# Calculator + multimodal tools (image generation, vision, speech, PDFs)
+from tools import CUSTOM_TOOLS
 
 # ==============================================================================
 # STEP 4: Create Agent with Memory and Tools
 # ==============================================================================
 
-# Collect available tools
-available_tools = [
-    docs_tool,
-    file_tool,
-    web_rag_tool,
-    youtube_tool,
-    calculator_tool,
-    image_tool,          # Image generation with DALL-E 3
-    vision_tool,         # Image analysis with GPT-4 Vision
-    speech_to_text_tool, # Audio transcription with Whisper
-    text_to_speech_tool, # Text-to-speech with OpenAI TTS
-    pdf_tool            # PDF document analysis
-]
-
-if search_tool:
-    available_tools.append(search_tool)
+# Collect available tools (fixed after startup, so a tuple)
+available_tools = tuple(
+    tool for tool in (
+        docs_tool,
+        file_tool,
+        web_rag_tool,
+        youtube_tool,
+        *CUSTOM_TOOLS,   # Calculator, DALL-E 3, GPT-4 Vision, Whisper, TTS, PDF
+        search_tool,     # None unless SERPER_API_KEY is set
+    )
+    if tool is not None
+)
 
 my_agent_twin = Agent(
     role="Personal Digital Twin with Memory and Tools",
@@ -373,13 +184,124 @@ answer_question_task = Task(
 # STEP 6: Create Crew with Memory Enabled
 # ==============================================================================
 
+# Local embeddings for memory: all-MiniLM-L6-v2 (384-dim) runs on your machine,
+# so memory lookups skip the OpenAI embeddings round-trip and vectors are 4x smaller.
+# Switching embedders changes the vector size - if you already have memory from
+# the default OpenAI embedder, run `python inspect_memory.py clear` once.
+class CachedEmbeddingFunction(SentenceTransformerEmbeddingFunction):
+    """Sentence-transformers embedder with a thread-safe LRU cache of past texts.
+
+    Agents re-ask memory the same things across turns ("what do you know
+    about me?"), so repeated texts skip the model entirely.
+    """
+
+    def __init__(self, *args, maxsize=1000, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cache = OrderedDict()
+        self._maxsize = maxsize
+        self._lock = threading.Lock()
+        self.stats = Counter()
+
+    def __call__(self, input):
+        # Copy hits out now - another thread may evict them while we embed misses
+        found = {}
+        with self._lock:
+            for text in input:
+                if text in self._cache:
+                    self._cache.move_to_end(text)
+                    found[text] = self._cache[text]
+        misses = list(dict.fromkeys(text for text in input if text not in found))
+        if misses:
+            found.update(zip(misses, super().__call__(misses)))
+
+        with self._lock:
+            self.stats["hits"] += len(input) - len(misses)
+            self.stats["misses"] += len(misses)
+            for text in misses:
+                self._cache[text] = found[text]
+            while len(self._cache) > self._maxsize:
+                self._cache.popitem(last=False)
+        return [found[text] for text in input]
+
+memory_embedder = CachedEmbeddingFunction(model_name="all-MiniLM-L6-v2")
+
+EMBEDDER_CONFIG = {
+    "provider": "custom",
+    "config": {
+        "embedder": memory_embedder,
+    },
+}
+
+class BatchedShortTermMemory(ShortTermMemory):
+    """Short-term memory that buffers a turn's writes and stores them in one batch."""
+
+    _pending: list = PrivateAttr(default_factory=list)
+
+    def save(self, value, metadata=None, agent=None):
+        """Queue an entry; it is written when flush() runs at the end of the task."""
+        metadata = dict(metadata or {})
+        if agent:
+            metadata.setdefault("agent", agent)
+        self._pending.append((value, metadata))
+
+    def flush(self):
+        """Write all queued entries with a single ChromaDB add() (one batched embedding)."""
+        if not self._pending:
+            return
+        documents = [value for value, _ in self._pending]
+        metadatas = [metadata for _, metadata in self._pending]
+        # Log and keep the entries on failure, like RAGStorage.save - a ChromaDB
+        # error (e.g. an embedding-size mismatch) shouldn't crash the chat loop
+        try:
+            self.storage.collection.add(
+                ids=[str(uuid.uuid4()) for _ in documents],
+                documents=documents,
+                metadatas=metadatas,
+            )
+        except Exception as e:
+            logging.error(f"Error during {self.storage.type} save: {str(e)}")
+            return
+        self._pending.clear()
+
+short_term_memory = BatchedShortTermMemory(embedder_config=EMBEDDER_CONFIG)
+
+def flush_short_term_memory(task_output):
+    """Task callback: store everything the agent remembered during this turn."""
+    short_term_memory.flush()
+
 my_crew = Crew(
     agents=[my_agent_twin],
     tasks=[answer_question_task],
     memory=True,  # This enables all 4 memory types!
+    embedder=EMBEDDER_CONFIG,
+    short_term_memory=short_term_memory,
+    task_callback=flush_short_term_memory,
     verbose=True,
 )
 
+# HNSW index settings for the ChromaDB memory stores (short-term + entity).
+# search_ef trades recall for latency on every lookup; construction_ef and M
+# only shape indexes built after the setting is stored.
+HNSW_SETTINGS = {
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 100,
+    "hnsw:M": 16,
+}
+
+def tune_memory_collections(crew):
+    """Apply HNSW_SETTINGS to the crew's ChromaDB-backed memory collections."""
+    for memory in (getattr(crew, "_short_term_memory", None), getattr(crew, "_entity_memory", None)):
+        collection = getattr(getattr(memory, "storage", None), "collection", None)
+        if collection is None:
+            continue
+        try:
+            collection.modify(metadata={**(collection.metadata or {}), **HNSW_SETTINGS})
+        except Exception as e:
+            # Older/newer ChromaDB versions may refuse some index changes
+            print(f"⚠️ Could not tune memory collection '{collection.name}': {e}")
+
+tune_memory_collections(my_crew)
+
 # ==============================================================================
 # STEP 7: Run Your Agent Twin with Memory!
 # ==============================================================================
@@ -397,6 +319,7 @@ if __name__ == "__main__":
         question = input("You: ").strip()
 
         if question.lower() in ['quit', 'exit', 'q']:
+            print_embedding_cache_stats(memory_embedder.stats)
             print("\nGoodbye! I'll remember this conversation.\n")
             break
 
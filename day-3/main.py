@@ -19,39 +19,112 @@ Architecture:
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import datetime, timezone
 from dotenv import load_dotenv
+from pathlib import Path
+import asyncio
 import os
+import sqlite3
+import time
 
 from crewai import Agent, Task, Crew, LLM
-from crewai.tools import BaseTool
 from crewai_tools import DirectoryReadTool, FileReadTool, SerperDevTool, WebsiteSearchTool, YoutubeVideoSearchTool
-from pydantic import Field
-from typing import Type
-from openai import OpenAI
+from crewai.memory import ShortTermMemory, EntityMemory
+from crewai.memory.storage.rag_storage import RAGStorage
+import chromadb
+from chromadb.config import Settings
 
 # Load environment variables
 load_dotenv()
 
+SERPER_API_KEY = os.getenv('SERPER_API_KEY')
+
 # ==============================================================================
 # FastAPI Application Setup
 # ==============================================================================
 
+# Set ENV=production to skip the interactive docs (/docs, /redoc, /openapi.json)
+# and the OpenAPI schema generation behind them
+IS_PRODUCTION = os.getenv("ENV") == "production"
+
 app = FastAPI(
     title="Personal Agent Twin API",
     description="Your Day 2 agent with memory and tools, now accessible via REST API!",
-    version="1.0.0"
+    version="1.0.0",
+    docs_url=None if IS_PRODUCTION else "/docs",
+    redoc_url=None if IS_PRODUCTION else "/redoc",
+    openapi_url=None if IS_PRODUCTION else "/openapi.json",
 )
 
 # Enable CORS (allows browser requests)
+# Set FRONTEND_ORIGIN to your frontend's URL; max_age lets browsers cache the
+# OPTIONS preflight for 24h instead of sending one before every POST /query
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=[os.getenv("FRONTEND_ORIGIN", "*")],
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["POST", "GET"],
+    allow_headers=["content-type", "authorization"],
+    max_age=86400,
 )
 
+# ==============================================================================
+# ChromaDB Connection (Railway private network)
+# ==============================================================================
+
+# When CHROMA_HOST is set (e.g. "chromadb" on Railway), short-term and entity
+# memory share ONE HttpClient and its keep-alive connections instead of each
+# opening their own. Leave it unset to keep memory in local files (good for local
+# testing). Knowledge and the RAG tools keep their own storage either way.
+CHROMA_HOST = os.getenv("CHROMA_HOST")
+CHROMA_PORT = int(os.getenv("CHROMA_PORT", 8000))
+
+chroma_client = None
+shared_memory = {}  # extra Crew(...) kwargs, filled in at startup
+
+class SharedChromaStorage(RAGStorage):
+    """RAGStorage that keeps its collection on the shared ChromaDB client."""
+
+    def _initialize_app(self):
+        # Resolve embedder_config into an embedding function, as RAGStorage does -
+        # without one Chroma can't embed anything we add or search
+        self._set_embedder_config()
+        self.app = chroma_client
+        self.collection = self.app.get_or_create_collection(
+            name=self.type,
+            embedding_function=self.embedder_config,
+        )
+
+def connect_chroma():
+    """
+    Connect to the ChromaDB service and build the memory stores on it.
+    
+    Returns the Crew kwargs for short-term and entity memory, or {} (CrewAI's
+    local storage) if CHROMA_HOST is unset or the server can't be reached.
+    """
+    global chroma_client
+    if not CHROMA_HOST:
+        return {}
+    try:
+        chroma_client = chromadb.HttpClient(
+            host=CHROMA_HOST,
+            port=CHROMA_PORT,
+            settings=Settings(anonymized_telemetry=False),
+        )
+        chroma_client.heartbeat()
+        return {
+            "short_term_memory": ShortTermMemory(
+                storage=SharedChromaStorage(type="short_term", allow_reset=True)
+            ),
+            "entity_memory": EntityMemory(
+                storage=SharedChromaStorage(type="entities", allow_reset=True)
+            ),
+        }
+    except Exception as e:
+        chroma_client = None
+        print(f"⚠️ ChromaDB unavailable at {CHROMA_HOST}:{CHROMA_PORT}, using local memory: {str(e)}")
+        return {}
+
 # ==============================================================================
 # Request/Response Models (API Input/Output)
 # ==============================================================================
@@ -77,161 +150,35 @@ class HealthResponse(BaseModel):
 # Tools Setup (from Day 2)
 # ==============================================================================
 
-# Tool 1: Calculator (custom tool from Day 2)
-class CalculatorInput(BaseModel):
-    expression: str = Field(..., description="Mathematical expression to evaluate")
-
-class CalculatorTool(BaseTool):
-    name: str = "calculator"
-    description: str = "Performs mathematical calculations"
-    args_schema: Type[BaseModel] = CalculatorInput
-
-    def _run(self, expression: str) -> str:
-        try:
-            result = eval(expression, {"__builtins__": {}}, {})
-            return f"Result: {result}"
-        except Exception as e:
-            return f"Error: {str(e)}"
-
-calculator_tool = CalculatorTool()
-
-# Tool 2: File Reading
+# Tool 1: File Reading
 file_tool = FileReadTool()
 
-# Tool 3: Website Search (RAG)
+# Tool 2: Website Search (RAG)
 web_rag_tool = WebsiteSearchTool()
 
-# Tool 4: YouTube Search (RAG)
+# Tool 3: YouTube Search (RAG)
 youtube_tool = YoutubeVideoSearchTool()
 
-# Tool 5: Web Search (optional - requires SERPER_API_KEY)
-search_tool = None
-if os.getenv('SERPER_API_KEY'):
-    search_tool = SerperDevTool()
+# Tool 4: Web Search (optional - requires SERPER_API_KEY)
+search_tool = SerperDevTool() if SERPER_API_KEY else None
 
 # ==============================================================================
-# Multimodal Tools: Vision, Audio, Documents
+# Custom Tools: Calculator, Vision, Audio, Documents (shared with Day 2)
 # ==============================================================================
 
-# Image Generation
-class ImageGenerationInput(BaseModel):
-    prompt: str = Field(..., description="Description of image to generate")
-
-class ImageGenerationTool(BaseTool):
-    name: str = "image_generator"
-    description: str = "Generates images using DALL-E 3"
-    args_schema: Type[BaseModel] = ImageGenerationInput
-
-    def _run(self, prompt: str) -> str:
-        try:
-            client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-            response = client.images.generate(model="dall-e-3", prompt=prompt, size="1024x1024", quality="standard", n=1)
-            return f"✅ Image URL: {response.data[0].url}"
-        except Exception as e:
-            return f"❌ Error: {str(e)}"
-
-# Image Analysis (Vision)
-class ImageAnalysisInput(BaseModel):
-    image_url: str = Field(..., description="URL of image to analyze")
-    question: str = Field(default="What's in this image?", description="Question about the image")
-
-class ImageAnalysisTool(BaseTool):
-    name: str = "analyze_image"
-    description: str = "Analyzes images using GPT-4 Vision. Can describe images, identify objects, read text (OCR)."
-    args_schema: Type[BaseModel] = ImageAnalysisInput
-
-    def _run(self, image_url: str, question: str = "What's in this image?") -> str:
-        try:
-            client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[{"role": "user", "content": [{"type": "text", "text": question}, {"type": "image_url", "image_url": {"url": image_url}}]}],
-                max_tokens=500
-            )
-            return f"🔍 {response.choices[0].message.content}"
-        except Exception as e:
-            return f"❌ Error: {str(e)}"
-
-# Speech-to-Text
-class SpeechToTextInput(BaseModel):
-    audio_file_path: str = Field(..., description="Path to audio file")
-
-class SpeechToTextTool(BaseTool):
-    name: str = "transcribe_audio"
-    description: str = "Converts speech to text using Whisper"
-    args_schema: Type[BaseModel] = SpeechToTextInput
-
-    def _run(self, audio_file_path: str) -> str:
-        try:
-            client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-            with open(audio_file_path, "rb") as audio_file:
-                transcript = client.audio.transcriptions.create(model="whisper-1", file=audio_file)
-            return f"🎤 {transcript.text}"
-        except Exception as e:
-            return f"❌ Error: {str(e)}"
-
-# Text-to-Speech
-class TextToSpeechInput(BaseModel):
-    text: str = Field(..., description="Text to convert to speech")
-    voice: str = Field(default="nova", description="Voice: alloy, echo, fable, onyx, nova, shimmer")
-
-class TextToSpeechTool(BaseTool):
-    name: str = "text_to_speech"
-    description: str = "Converts text to speech audio"
-    args_schema: Type[BaseModel] = TextToSpeechInput
-
-    def _run(self, text: str, voice: str = "nova") -> str:
-        try:
-            client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-            response = client.audio.speech.create(model="tts-1", voice=voice, input=text)
-            filename = "speech_output.mp3"
-            response.stream_to_file(filename)
-            return f"🔊 Audio saved to {filename}"
-        except Exception as e:
-            return f"❌ Error: {str(e)}"
-
-# PDF Analysis
-class PDFAnalysisInput(BaseModel):
-    pdf_path: str = Field(..., description="Path to PDF file")
-
-class PDFAnalysisTool(BaseTool):
-    name: str = "analyze_pdf"
-    description: str = "Extracts text from PDF documents"
-    args_schema: Type[BaseModel] = PDFAnalysisInput
-
-    def _run(self, pdf_path: str) -> str:
-        try:
-            import pdfplumber
-            with pdfplumber.open(pdf_path) as pdf:
-                text = ""
-                for page in pdf.pages:
-                    text += page.extract_text() + "\n\n"
-                return f"📄 Pages: {len(pdf.pages)}\n\n{text[:3000]}"
-        except Exception as e:
-            return f"❌ Error: {str(e)}"
-
-# Instantiate tools
-image_gen_tool = ImageGenerationTool()
-vision_tool = ImageAnalysisTool()
-speech_to_text_tool = SpeechToTextTool()
-text_to_speech_tool = TextToSpeechTool()
-pdf_tool = PDFAnalysisTool()
-
-# Collect all tools
-available_tools = [
-    calculator_tool,
-    file_tool,
-    web_rag_tool,
-    youtube_tool,
-    image_gen_tool,
-    vision_tool,
-    speech_to_text_tool,
-    text_to_speech_tool,
-    pdf_tool
-]
-
-if search_tool:
-    available_tools.append(search_tool)
+from tools import CUSTOM_TOOLS
+
+# Collect all tools (fixed after startup, so a tuple)
+available_tools = tuple(
+    tool for tool in (
+        file_tool,
+        web_rag_tool,
+        youtube_tool,
+        *CUSTOM_TOOLS,
+        search_tool,
+    )
+    if tool is not None
+)
 
 # ==============================================================================
 # Agent Setup (from Day 2, with memory!)
@@ -288,6 +235,30 @@ my_agent_twin = Agent(
     verbose=False,  # Set to True for debugging
 )
 
+# ==============================================================================
+# Memory Storage Setup
+# ==============================================================================
+
+def enable_long_term_memory_wal():
+    """
+    Switch CrewAI's long-term memory SQLite database to WAL journaling.
+    
+    journal_mode=WAL is saved in the database file itself, so every connection
+    CrewAI opens later inherits it (fewer fsyncs per memory write). Other
+    PRAGMAs like synchronous or cache_size only last for one connection.
+    """
+    try:
+        from crewai.utilities.paths import db_storage_path
+        ltm_db = Path(db_storage_path()) / "long_term_memory_storage.db"
+        ltm_db.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(ltm_db))
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"⚠️ Could not enable WAL for long-term memory: {str(e)}")
+        return False
+
 # ==============================================================================
 # API Endpoints
 # ==============================================================================
@@ -303,7 +274,7 @@ async def root():
         "endpoints": {
             "health": "GET /health",
             "query": "POST /query",
-            "docs": "GET /docs"
+            "docs": "disabled" if IS_PRODUCTION else "GET /docs"
         }
     }
 
@@ -336,40 +307,45 @@ async def query_agent(request: QueryRequest):
           -H "Content-Type: application/json" \\
           -d '{"question": "What is 123 * 456?"}'
     """
-    start_time = datetime.now()
+    start_time = time.monotonic()
 
     try:
+        # Each request gets its own copy of the agent: the crew runs in a worker
+        # thread, and concurrent runs must not share the agent's executor state
+        agent = my_agent_twin.copy()
+
         # Create task for this query
         task = Task(
-            description=f"""
-            Answer the following question: {request.question}
+            description="""
+            Answer the following question: {question}
             
             Use your memory to recall relevant context.
             Use your tools when you need external information or calculations.
             Provide accurate, helpful responses.
             """,
             expected_output="A clear, context-aware answer using memory and tools as needed",
-            agent=my_agent_twin,
+            agent=agent,
         )
 
         # Create crew with memory enabled
         crew = Crew(
-            agents=[my_agent_twin],
+            agents=[agent],
             tasks=[task],
             memory=True,  # This enables all 4 memory types!
+            **shared_memory,
             verbose=False,
         )
 
-        # Execute the crew
-        result = crew.kickoff()
+        # Execute the crew in a worker thread so the event loop keeps serving
+        # other requests (and health checks) while the LLM is thinking
+        result = await asyncio.to_thread(crew.kickoff, inputs={"question": request.question})
 
-        # Calculate processing time
-        end_time = datetime.now()
-        processing_time = (end_time - start_time).total_seconds()
+        # Calculate processing time (monotonic clock, unaffected by clock changes)
+        processing_time = time.monotonic() - start_time
 
         return QueryResponse(
             answer=str(result.raw),
-            timestamp=end_time.isoformat(),
+            timestamp=datetime.now(timezone.utc).isoformat(timespec="seconds"),
             processing_time=processing_time
         )
 
@@ -386,14 +362,23 @@ async def query_agent(request: QueryRequest):
 @app.on_event("startup")
 async def startup_event():
     """Run when the API starts"""
+    global shared_memory
+    # HttpClient connects synchronously - keep it off the event loop
+    shared_memory = await asyncio.to_thread(connect_chroma)
+
     print("\n" + "="*70)
     print("🚀 Personal Agent Twin API Starting...")
     print("="*70)
     print(f"\n✅ Model: {llm.model}")
     print(f"✅ Memory: Enabled (4 types)")
+    if chroma_client is not None:
+        print(f"✅ ChromaDB: {CHROMA_HOST}:{CHROMA_PORT} (shared client)")
+    if enable_long_term_memory_wal():
+        print("✅ Long-Term Memory: WAL journaling")
     print(f"✅ Tools: {len(available_tools)} tools loaded")
     print("✅ Agent: Initialized")
-    print("\n📚 Documentation: http://localhost:8000/docs")
+    if not IS_PRODUCTION:
+        print("\n📚 Documentation: http://localhost:8000/docs")
     print("="*70 + "\n")
 
 # ==============================================================================
@@ -401,7 +386,7 @@ async def startup_event():
 # ==============================================================================
 """
 LOCAL TESTING:
-    uvicorn main:app --reload
+    uvicorn main:app --reload --loop uvloop --http httptools
     
     Then test:
     curl -X POST http://localhost:8000/query \\
@@ -409,8 +394,8 @@ LOCAL TESTING:
       -d '{"question": "What is 50 * 50?"}'
 
 RAILWAY DEPLOYMENT:
-    Railway automatically detects and runs this with:
-    uvicorn main:app --host 0.0.0.0 --port $PORT
+    Railway runs this with (see railway.json):
+    uvicorn main:app --host 0.0.0.0 --port $PORT --workers 1 --loop uvloop --http httptools
 """
 
 if __name__ == "__main__":
@@ -0,0 +1,52 @@
+"""
+Tests for the shared ChromaDB memory storage
+
+Runs against an in-memory Chroma client with a fake embedder, so it needs
+neither a ChromaDB service nor an OpenAI call:
+    pytest test_memory.py -v
+"""
+
+import os
+
+import chromadb
+import pytest
+from chromadb import Documents, EmbeddingFunction, Embeddings
+
+# main builds its tools at import time, which only needs a key to be present
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+import main
+
+
+class FakeEmbedding(EmbeddingFunction):
+    """Deterministic 3-d vectors based on the text, no network"""
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return [[float(len(text)), float(text.count(" ")), 1.0] for text in input]
+
+
+@pytest.fixture
+def shared_client(monkeypatch):
+    """Stand in for the HttpClient connect_chroma() creates"""
+    client = chromadb.EphemeralClient()
+    monkeypatch.setattr(main, "chroma_client", client)
+    yield client
+    for collection in client.list_collections():
+        client.delete_collection(getattr(collection, "name", collection))
+
+
+def test_shared_storage_saves_and_searches(shared_client):
+    """A collection created by SharedChromaStorage can embed what it stores"""
+    storage = main.SharedChromaStorage(
+        type="short_term",
+        allow_reset=True,
+        embedder_config={"provider": "custom", "config": {"embedder": FakeEmbedding()}},
+    )
+    assert storage.app is shared_client
+
+    storage.save("My favourite colour is green", {"agent": "twin"})
+    # RAGStorage.save only logs failures, so check the collection directly
+    assert storage.collection.count() == 1
+
+    results = storage.search("My favourite colour is green", score_threshold=0)
+    assert [result["context"] for result in results] == ["My favourite colour is green"]
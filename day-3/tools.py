@@ -0,0 +1,314 @@
+"""
+Custom Tools - Calculator and Multimodal (Vision, Audio, Documents)
+===================================================================
+
+Shared by the Day 2 and Day 3 agents. Keep this file identical in both
+folders (each folder is deployed on its own, so it can't import the other).
+"""
+
+from crewai.tools import BaseTool
+from pydantic import BaseModel, Field
+from typing import Optional, Type
+from functools import lru_cache
+import ast
+import operator
+import os
+import httpx
+from dotenv import load_dotenv
+from openai import OpenAI
+
+load_dotenv()
+
+# Read once at import instead of on every tool call
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+# ==============================================================================
+# Calculator Tool
+# ==============================================================================
+
+# Largest integer power result allowed, in bits - "9**9**9**9" would otherwise
+# pin a worker thread forever (and then sit in the lru_cache)
+_MAX_POWER_BITS = 10_000
+
+def _safe_pow(base, exponent):
+    """operator.pow with a cap on the size of integer results."""
+    if isinstance(base, int) and isinstance(exponent, int) and abs(base) > 1 and exponent > 0:
+        if abs(base).bit_length() * exponent > _MAX_POWER_BITS:
+            raise ValueError("Exponent too large")
+    return operator.pow(base, exponent)
+
+# Arithmetic operators the calculator is allowed to evaluate
+_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: _safe_pow,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+
+def _eval_node(node):
+    """Evaluate an arithmetic AST node, rejecting names, calls and attributes."""
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float, complex):
+        return node.value
+    if isinstance(node, ast.BinOp) and type(node.op) in _OPS:
+        return _OPS[type(node.op)](_eval_node(node.left), _eval_node(node.right))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _OPS:
+        return _OPS[type(node.op)](_eval_node(node.operand))
+    raise ValueError(f"Unsupported expression element: {type(node).__name__}")
+
+@lru_cache(maxsize=1024)
+def _evaluate(expression: str):
+    """Parse and evaluate an expression (cached, agents often retry the same one)."""
+    return _eval_node(ast.parse(expression.strip(), mode="eval").body)
+
+class CalculatorInput(BaseModel):
+    """Input schema for Calculator tool."""
+    expression: str = Field(..., description="Mathematical expression to evaluate")
+
+class CalculatorTool(BaseTool):
+    name: str = "calculator"
+    description: str = "Performs mathematical calculations. Use for any math operations."
+    args_schema: Type[BaseModel] = CalculatorInput
+
+    def _run(self, expression: str) -> str:
+        """Execute the calculation."""
+        try:
+            result = _evaluate(expression)
+            return f"Result: {result}"
+        except Exception as e:
+            return f"Error: {str(e)}"
+
+calculator_tool = CalculatorTool()
+
+# Shared OpenAI client: one connection pool (and TLS session) reused by all tools
+_OPENAI: Optional[OpenAI] = None
+
+def _get_openai() -> OpenAI:
+    """Return the process-wide OpenAI client, creating it on first use."""
+    global _OPENAI
+    if _OPENAI is None:
+        _OPENAI = OpenAI(
+            api_key=OPENAI_API_KEY,
+            http_client=httpx.Client(
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=20),
+                timeout=httpx.Timeout(600.0, connect=5.0),  # Same as the SDK default
+                follow_redirects=True,
+            ),
+        )
+    return _OPENAI
+
+# ==============================================================================
+# CUSTOM TOOL: Image Generation
+# ==============================================================================
+
+class ImageGenerationInput(BaseModel):
+    """Input schema for Image Generation tool."""
+    prompt: str = Field(..., description="Detailed description of the image to generate")
+
+class ImageGenerationTool(BaseTool):
+    name: str = "image_generator"
+    description: str = "Generates an image based on a text description using DALL-E 3. Use this when asked to create, generate, or draw an image."
+    args_schema: Type[BaseModel] = ImageGenerationInput
+
+    def _run(self, prompt: str) -> str:
+        """Generate an image using DALL-E."""
+        try:
+            client = _get_openai()
+
+            response = client.images.generate(
+                model="dall-e-3",
+                prompt=prompt,
+                size="1024x1024",
+                quality="standard",
+                n=1,
+            )
+
+            image_url = response.data[0].url
+            revised_prompt = response.data[0].revised_prompt
+
+            return f"✅ Image generated successfully!\n\nImage URL: {image_url}\n\nRevised prompt used: {revised_prompt}\n\nYou can view the image by opening the URL in your browser."
+        except Exception as e:
+            return f"❌ Error generating image: {str(e)}\n\nMake sure your OPENAI_API_KEY is set and has available credits."
+
+image_tool = ImageGenerationTool()
+
+# ==============================================================================
+# MULTIMODAL TOOLS: Vision, Audio, Documents
+# ==============================================================================
+
+# VISION: Image Analysis Tool (GPT-4 Vision)
+class ImageAnalysisInput(BaseModel):
+    """Input schema for Image Analysis tool."""
+    image_url: str = Field(..., description="URL of the image to analyze")
+    question: str = Field(default="What's in this image?", description="Specific question about the image")
+
+class ImageAnalysisTool(BaseTool):
+    name: str = "analyze_image"
+    description: str = "Analyzes images using GPT-4 Vision. Can describe images, identify objects, read text in images (OCR), and answer questions about visual content. Provide an image URL."
+    args_schema: Type[BaseModel] = ImageAnalysisInput
+
+    def _run(self, image_url: str, question: str = "What's in this image? Describe it in detail.") -> str:
+        """Analyze an image using GPT-4 Vision."""
+        try:
+            client = _get_openai()
+            
+            response = client.chat.completions.create(
+                model="gpt-4o",  # GPT-4 with vision capabilities
+                messages=[
+                    {
+                        "role": "user",
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": question
+                            },
+                            {
+                                "type": "image_url",
+                                "image_url": {"url": image_url}
+                            }
+                        ]
+                    }
+                ],
+                max_tokens=500
+            )
+            
+            analysis = response.choices[0].message.content
+            return f"🔍 Image Analysis:\n\n{analysis}"
+        except Exception as e:
+            return f"❌ Error analyzing image: {str(e)}"
+
+vision_tool = ImageAnalysisTool()
+
+# AUDIO: Speech-to-Text Tool (Whisper)
+class SpeechToTextInput(BaseModel):
+    """Input schema for Speech-to-Text tool."""
+    audio_file_path: str = Field(..., description="Path to audio file (mp3, wav, m4a, etc.)")
+
+class SpeechToTextTool(BaseTool):
+    name: str = "transcribe_audio"
+    description: str = "Converts speech/audio to text using Whisper. Supports mp3, wav, m4a, and other audio formats."
+    args_schema: Type[BaseModel] = SpeechToTextInput
+
+    def _run(self, audio_file_path: str) -> str:
+        """Transcribe audio to text using Whisper."""
+        try:
+            client = _get_openai()
+            
+            with open(audio_file_path, "rb") as audio_file:
+                transcript = client.audio.transcriptions.create(
+                    model="whisper-1",
+                    file=audio_file
+                )
+            
+            return f"🎤 Transcription:\n\n{transcript.text}"
+        except Exception as e:
+            return f"❌ Error transcribing audio: {str(e)}\n\nMake sure the audio file exists at: {audio_file_path}"
+
+speech_to_text_tool = SpeechToTextTool()
+
+# AUDIO: Text-to-Speech Tool (OpenAI TTS)
+class TextToSpeechInput(BaseModel):
+    """Input schema for Text-to-Speech tool."""
+    text: str = Field(..., description="Text to convert to speech")
+    voice: str = Field(default="nova", description="Voice to use: alloy, echo, fable, onyx, nova, shimmer")
+    output_file: str = Field(default="speech_output.mp3", description="Output filename for the audio")
+
+class TextToSpeechTool(BaseTool):
+    name: str = "text_to_speech"
+    description: str = "Converts text to natural-sounding speech audio. Choose from voices: alloy, echo, fable, onyx, nova (default), shimmer."
+    args_schema: Type[BaseModel] = TextToSpeechInput
+
+    def _run(self, text: str, voice: str = "nova", output_file: str = "speech_output.mp3") -> str:
+        """Convert text to speech using OpenAI TTS."""
+        try:
+            client = _get_openai()
+            
+            response = client.audio.speech.create(
+                model="tts-1",
+                voice=voice,
+                input=text
+            )
+            
+            # The audio is already in memory - write it in one go
+            with open(output_file, "wb") as f:
+                f.write(response.content)
+            return f"🔊 Audio generated successfully!\n\nSaved to: {output_file}\nVoice: {voice}\nText: {text[:100]}..."
+        except Exception as e:
+            return f"❌ Error generating speech: {str(e)}"
+
+text_to_speech_tool = TextToSpeechTool()
+
+# DOCUMENTS: PDF Analysis Tool
+class PDFAnalysisInput(BaseModel):
+    """Input schema for PDF Analysis tool."""
+    pdf_path: str = Field(..., description="Path to PDF file to analyze")
+
+@lru_cache(maxsize=8)
+def _extract_pdf_text(pdf_path: str, mtime: float, size: int):
+    """Return (page_count, text, truncated) with at most 3000 chars of text.
+    
+    Cached, so follow-up questions about the same PDF skip re-parsing it.
+    """
+    import pdfplumber
+    
+    parts = []
+    length = 0
+    truncated = False
+    
+    # Stop extracting once we have enough text (extract_text is slow)
+    with pdfplumber.open(pdf_path) as pdf:
+        page_count = len(pdf.pages)
+        for page in pdf.pages:
+            text = page.extract_text() or ""
+            parts.append(text)
+            parts.append("\n\n")
+            length += len(text) + 2
+            if length > 3000:
+                truncated = True
+                break
+    
+    return page_count, "".join(parts)[:3000], truncated
+
+class PDFAnalysisTool(BaseTool):
+    name: str = "analyze_pdf"
+    description: str = "Reads and extracts text from PDF documents. Can analyze PDFs, extract content, and answer questions about PDF files."
+    args_schema: Type[BaseModel] = PDFAnalysisInput
+
+    def _run(self, pdf_path: str) -> str:
+        """Analyze a PDF document."""
+        try:
+            # Size and mtime are part of the cache key, so edited files are re-read
+            stat = os.stat(pdf_path)
+            page_count, text_content, truncated = _extract_pdf_text(
+                os.path.abspath(pdf_path), stat.st_mtime, stat.st_size
+            )
+            
+            # Limit output size
+            if truncated:
+                text_content += "\n\n[Content truncated - PDF is longer]"
+            
+            return f"📄 PDF Analysis:\n\nPages: {page_count}\n\nContent:\n{text_content}"
+        except FileNotFoundError:
+            return f"❌ Error: PDF file not found at {pdf_path}"
+        except Exception as e:
+            return f"❌ Error analyzing PDF: {str(e)}"
+
+pdf_tool = PDFAnalysisTool()
+
+# ==============================================================================
+# All custom tools (add these to your agent's tool list)
+# ==============================================================================
+
+CUSTOM_TOOLS = (
+    calculator_tool,
+    image_tool,          # Image generation with DALL-E 3
+    vision_tool,         # Image analysis with GPT-4 Vision
+    speech_to_text_tool, # Audio transcription with Whisper
+    text_to_speech_tool, # Text-to-speech with OpenAI TTS
+    pdf_tool,            # PDF document analysis
+)
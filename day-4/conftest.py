@@ -0,0 +1,33 @@
+"""
+Pytest setup for the Day 4 A2A tests
+
+pytest and pytest-xdist are in requirements.txt. The A2A tests talk to a
+running agent over HTTP:
+    uvicorn main:app                      # in one terminal
+    pytest -n auto test_a2a.py -v         # in another
+
+Point them at a deployed agent with:
+    A2A_BASE_URL=https://your-agent.railway.app pytest -n auto test_a2a.py
+"""
+
+import os
+
+import httpx
+import pytest
+
+BASE_URL = os.getenv("A2A_BASE_URL", "http://localhost:8000")
+
+# test_a2a_strict.py is a walkthrough script that sends its requests at import time
+collect_ignore = ["test_a2a_strict.py"]
+
+
+@pytest.fixture(scope="session")
+def client():
+    """One keep-alive HTTP client per test worker; skips everything if the agent isn't running"""
+    # Generous timeout - /query waits on a full LLM answer
+    with httpx.Client(base_url=BASE_URL, timeout=120) as client:
+        try:
+            client.get("/health", timeout=5)
+        except httpx.TransportError:
+            pytest.skip(f"No agent running at {BASE_URL} (start it with: uvicorn main:app)")
+        yield client
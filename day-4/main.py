@@ -35,23 +35,43 @@ Logging:
 """
 
 from fastapi import FastAPI, HTTPException
+from fastapi import Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import datetime, timezone
+import time
 from dotenv import load_dotenv
 import os
 import re
 import httpx
 import logging
 import json
+import asyncio
+import hashlib
+import orjson
+import threading
+import textwrap
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from typing import Optional, Dict, Any
+from cachetools import TTLCache
 
 from crewai import Agent, Task, Crew, LLM
+try:
+    from crewai.events import crewai_event_bus, LLMStreamChunkEvent
+except ImportError:  # older CrewAI releases
+    from crewai.utilities.events import crewai_event_bus, LLMStreamChunkEvent
 from crewai.tools import BaseTool
 from crewai_tools import FileReadTool, SerperDevTool, WebsiteSearchTool, YoutubeVideoSearchTool
 from pydantic import Field
 from typing import Type
 from openai import OpenAI
+from chromadb.utils.embedding_functions import OpenAIEmbeddingFunction
+import litellm
+from prometheus_client import Counter
+from prometheus_fastapi_instrumentator import Instrumentator
 
 # Load environment variables
 load_dotenv()
@@ -78,6 +98,13 @@ a2a_file_handler.setFormatter(formatter)
 # Add handler to logger
 a2a_logger.addHandler(a2a_file_handler)
 
+# LLM token usage per call (identical prompts should log identical prompt_tokens)
+usage_logger = logging.getLogger("llm_usage")
+usage_logger.setLevel(logging.INFO)
+usage_file_handler = logging.FileHandler("logs/llm_usage.log")
+usage_file_handler.setFormatter(formatter)
+usage_logger.addHandler(usage_file_handler)
+
 # ==============================================================================
 # FastAPI Application Setup
 # ==============================================================================
@@ -85,7 +112,8 @@ a2a_logger.addHandler(a2a_file_handler)
 app = FastAPI(
     title="Personal Agent Twin API with A2A",
     description="Your agent with memory, tools, AND agent-to-agent communication!",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=ORJSONResponse,  # orjson encodes responses much faster than json
 )
 
 # Enable CORS
@@ -105,11 +133,13 @@ class QueryRequest(BaseModel):
     """Standard query request"""
     question: str
     user_id: str = "anonymous"
+    conversation_id: Optional[str] = None  # Queries with the same ID reuse one crew
+    use_memory: bool = True  # False skips the memory lookups (one-shot questions)
 
 class QueryResponse(BaseModel):
     """Standard query response"""
     answer: str
-    timestamp: str
+    timestamp: datetime
     processing_time: float
 
 class A2AMessage(BaseModel):
@@ -123,7 +153,7 @@ class A2AResponse(BaseModel):
     content: Dict[str, Any]
     role: str = "assistant"
     conversation_id: str
-    timestamp: str
+    timestamp: datetime
     agent_id: str
 
 class HealthResponse(BaseModel):
@@ -143,7 +173,7 @@ class SearchResponse(BaseModel):
     """Search response"""
     selected_agent: Dict[str, Any]
     agent_response: str
-    timestamp: str
+    timestamp: datetime
     processing_time: float
 
 # ==============================================================================
@@ -340,6 +370,9 @@ available_tools = [
 if search_tool:
     available_tools.append(search_tool)
 
+# Tool list is fixed from here on
+TOOLS_COUNT = len(available_tools)
+
 # ==============================================================================
 # Agent Setup (from Day 3)
 # ==============================================================================
@@ -350,13 +383,10 @@ llm = LLM(
     temperature=0.7,
 )
 
-# Create agent with memory and tools
-my_agent_twin = Agent(
-    role="Personal Digital Twin with Memory, Tools, and A2A Communication",
-    
-    goal="Answer questions, remember conversations, use tools, and communicate with other agents",
-    
-    backstory=f"""
+# Backstory is built once so every request sends byte-identical text
+# (OpenAI prompt caching only reuses an exact matching prefix). dedent/strip
+# drops the source indentation - fewer tokens, and no whitespace drift on edits.
+AGENT_BACKSTORY = textwrap.dedent(f"""
     You are E.D.I.T.H - Enhanced Digital Intelligence & Tactical Helper.
     Your agent ID is: {MY_AGENT_ID}
     
@@ -392,13 +422,481 @@ my_agent_twin = Agent(
     You'll receive responses and can continue the conversation.
     
     Use tools for external info. Use memory for personalized responses. Use A2A to collaborate!
-    """,
+""").strip()
+
+# Create agent with memory and tools
+my_agent_twin = Agent(
+    role="Personal Digital Twin with Memory, Tools, and A2A Communication",
+    
+    goal="Answer questions, remember conversations, use tools, and communicate with other agents",
+    
+    backstory=AGENT_BACKSTORY,
     
     tools=available_tools,
     llm=llm,
     verbose=False,
 )
 
+# ==============================================================================
+# Prompt Cache Telemetry
+# ==============================================================================
+
+# OpenAI caches repeated prompt prefixes automatically (prompts of 1024+ tokens).
+# Count how many prompt tokens came from that cache, so a change that breaks the
+# stable prefix shows up as a falling hit ratio instead of silently costing more.
+PROMPT_TOKENS = Counter("llm_prompt_tokens_total", "Prompt tokens sent to the LLM")
+CACHED_PROMPT_TOKENS = Counter("llm_cached_prompt_tokens_total", "Prompt tokens served from OpenAI's prompt cache")
+
+PROMPT_CACHE_WINDOW_SECONDS = 300
+PROMPT_CACHE_MIN_HIT_RATIO = 0.5
+PROMPT_CACHE_MIN_TOKENS = 10_000  # Don't judge the ratio on a handful of calls
+
+# (time.monotonic(), prompt_tokens, cached_tokens) per LLM call in the window
+prompt_cache_window: deque = deque()
+prompt_cache_lock = threading.Lock()
+prompt_cache_last_warning = 0.0
+
+def prompt_cache_window_totals() -> tuple[int, int]:
+    """(prompt_tokens, cached_tokens) over the last 5 minutes"""
+    cutoff = time.monotonic() - PROMPT_CACHE_WINDOW_SECONDS
+    with prompt_cache_lock:
+        while prompt_cache_window and prompt_cache_window[0][0] < cutoff:
+            prompt_cache_window.popleft()
+        return (
+            sum(prompt for _, prompt, _ in prompt_cache_window),
+            sum(cached for _, _, cached in prompt_cache_window),
+        )
+
+def prompt_cache_hit_ratio() -> Optional[float]:
+    """Share of prompt tokens served from cache over the last 5 minutes"""
+    prompt_tokens, cached_tokens = prompt_cache_window_totals()
+    return round(cached_tokens / prompt_tokens, 3) if prompt_tokens else None
+
+def record_prompt_cache_usage(kwargs, completion_response, start_time, end_time):
+    """LiteLLM success callback - record prompt and cached token counts"""
+    global prompt_cache_last_warning
+    usage = getattr(completion_response, "usage", None)
+    if not usage:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    prompt_tokens = usage.prompt_tokens or 0
+    cached_tokens = getattr(details, "cached_tokens", None) or 0
+    
+    PROMPT_TOKENS.inc(prompt_tokens)
+    CACHED_PROMPT_TOKENS.inc(cached_tokens)
+    usage_logger.info(
+        f"model={kwargs.get('model')} | prompt_tokens={prompt_tokens} | "
+        f"cached_tokens={cached_tokens} | completion_tokens={usage.completion_tokens or 0}"
+    )
+    now = time.monotonic()
+    with prompt_cache_lock:
+        prompt_cache_window.append((now, prompt_tokens, cached_tokens))
+    
+    # Warn (at most once per window) if the prefix cache stops working
+    window_prompt, window_cached = prompt_cache_window_totals()
+    if (
+        window_prompt >= PROMPT_CACHE_MIN_TOKENS
+        and window_cached / window_prompt < PROMPT_CACHE_MIN_HIT_RATIO
+        and now - prompt_cache_last_warning > PROMPT_CACHE_WINDOW_SECONDS
+    ):
+        prompt_cache_last_warning = now
+        print(
+            f"⚠️ Prompt cache hit ratio {window_cached / window_prompt:.0%} over the last 5 min "
+            f"(below {PROMPT_CACHE_MIN_HIT_RATIO:.0%}) - check that prompt prefixes are stable"
+        )
+
+litellm.success_callback.append(record_prompt_cache_usage)
+
+# Request metrics + the token counters above at GET /metrics (Prometheus format)
+Instrumentator().instrument(app).expose(app, include_in_schema=False)
+
+# ==============================================================================
+# Memory Embeddings (shared by every crew)
+# ==============================================================================
+
+class SharedEmbeddingFunction(OpenAIEmbeddingFunction):
+    """OpenAI embedder with a thread-safe LRU cache, shared by all crews.
+
+    Short-term, entity and contextual memory each embed the same question
+    on every kickoff - only the first lookup goes to OpenAI. Any texts not
+    in the cache are sent together in a single embeddings request.
+    """
+
+    def __init__(self, *args, maxsize=2048, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cache = OrderedDict()  # blake2b(text) -> embedding
+        self._maxsize = maxsize
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(text):
+        return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+    def __call__(self, input):
+        keys = [self._key(text) for text in input]
+        # Copy hits out now - another thread may evict them during the API call
+        found = {}
+        misses = {}
+        with self._lock:
+            for key, text in zip(keys, input):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    found[key] = self._cache[key]
+                else:
+                    misses[key] = text
+        if misses:
+            found.update(zip(misses, super().__call__(list(misses.values()))))
+
+            with self._lock:
+                for key in misses:
+                    self._cache[key] = found[key]
+                while len(self._cache) > self._maxsize:
+                    self._cache.popitem(last=False)
+        return [found[key] for key in keys]
+
+# Created on first use, not at import: OpenAIEmbeddingFunction raises without
+# OPENAI_API_KEY, which would break `import main` (and test collection)
+_MEMORY_EMBEDDER: Optional[SharedEmbeddingFunction] = None
+_memory_embedder_lock = threading.Lock()
+
+def get_embedder_config() -> Dict[str, Any]:
+    """Crew embedder config pointing at the process-wide memory embedder"""
+    global _MEMORY_EMBEDDER
+    # Crews are built in worker threads - make sure only one embedder is created
+    with _memory_embedder_lock:
+        if _MEMORY_EMBEDDER is None:
+            # 256 dimensions instead of 1536: 6x smaller vectors and faster memory search.
+            # Switching sizes doesn't mix with existing memory - if you already have
+            # memory from the default embedder, run `crewai reset-memories -a` once.
+            _MEMORY_EMBEDDER = SharedEmbeddingFunction(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                model_name="text-embedding-3-small",
+                dimensions=256,
+            )
+    return {
+        "provider": "custom",
+        "config": {
+            "embedder": _MEMORY_EMBEDDER,
+        },
+    }
+
+# ==============================================================================
+# Query Crews (reused across requests)
+# ==============================================================================
+
+# Task template - CrewAI fills in {question} from kickoff(inputs=...)
+# Static instructions first and the question last, so the prompt prefix
+# stays identical across requests and can hit OpenAI's prompt cache
+QUERY_TASK_DESCRIPTION = textwrap.dedent("""
+    Answer the user's question below.
+    
+    Use your memory to recall relevant context.
+    Use your tools when you need external information or calculations.
+    Provide accurate, helpful responses.
+    
+    USER QUESTION: {question}
+""").strip()
+QUERY_EXPECTED_OUTPUT = "A clear, context-aware answer using memory and tools as needed"
+
+# Worker threads for blocking crew/LLM calls (keep within your OpenAI rate limit)
+CREW_THREADS = int(os.getenv("CREW_THREADS", "16"))
+
+# How many conversations keep a ready-to-use crew (least recently used are dropped)
+MAX_CACHED_CREWS = 32
+
+# (conversation_id, use_memory) -> Crew
+query_crews: "OrderedDict[tuple[str, bool], Crew]" = OrderedDict()
+
+# (conversation_id, use_memory) -> Lock, so each crew runs one query at a time
+query_locks: Dict[tuple[str, bool], asyncio.Lock] = defaultdict(asyncio.Lock)
+
+# (conversation_id, use_memory) -> queries running or waiting on that lock
+query_pending: Dict[tuple[str, bool], int] = defaultdict(int)
+
+# A burst on one conversation gets 429 instead of piling up behind its lock
+MAX_PENDING_PER_CONVERSATION = int(os.getenv("MAX_PENDING_PER_CONVERSATION", "4"))
+
+# Queries allowed to run LLM work at once across all conversations (the rest wait)
+MAX_INFLIGHT_QUERIES = int(os.getenv("MAX_INFLIGHT_QUERIES", str(CREW_THREADS)))
+inflight_queries = asyncio.Semaphore(MAX_INFLIGHT_QUERIES)
+
+def build_query_crew(use_memory: bool = True) -> Crew:
+    """Create a crew whose single task answers {question}"""
+    # Own copy of the agent so crews can run in parallel threads, with its own
+    # LLM so /query/stream can tell which crew a token came from (and switch
+    # streaming on for just that run)
+    agent = my_agent_twin.copy()
+    agent.llm = LLM(model=llm.model, temperature=llm.temperature)
+    task = Task(
+        description=QUERY_TASK_DESCRIPTION,
+        expected_output=QUERY_EXPECTED_OUTPUT,
+        agent=agent,
+    )
+    return Crew(
+        agents=[agent],
+        tasks=[task],
+        # Memory means 4 stores queried on every kickoff - only when wanted
+        memory=use_memory,
+        embedder=get_embedder_config(),
+        verbose=False,
+    )
+
+async def get_query_crew(conversation_id: str, use_memory: bool = True) -> Crew:
+    """Return the crew for a conversation, building it on first use"""
+    key = (conversation_id, use_memory)
+    crew = query_crews.pop(key, None)
+    if crew is None:
+        # Agent copy, Crew validation and memory setup block - keep them off the event loop
+        crew = await asyncio.to_thread(build_query_crew, use_memory)
+    query_crews[key] = crew
+    while len(query_crews) > MAX_CACHED_CREWS:
+        query_crews.popitem(last=False)
+    return crew
+
+def conversation_is_full(key: tuple[str, bool]) -> bool:
+    """True if a conversation already has the maximum number of queued queries"""
+    return query_pending.get(key, 0) >= MAX_PENDING_PER_CONVERSATION
+
+@asynccontextmanager
+async def conversation_slot(key: tuple[str, bool]):
+    """
+    Run one query for a conversation: its lock, then a global in-flight slot
+    
+    Raises 429 if too many queries for this conversation are already queued.
+    """
+    if conversation_is_full(key):
+        raise HTTPException(
+            status_code=429,
+            detail="Too many queries queued for this conversation - retry shortly"
+        )
+    query_pending[key] += 1
+    try:
+        async with query_locks[key], inflight_queries:
+            yield
+    finally:
+        query_pending[key] -= 1
+        if not query_pending[key]:
+            # Nobody holds or waits on this lock any more - drop it so the
+            # dicts don't grow with every conversation ever seen
+            del query_pending[key]
+            query_locks.pop(key, None)
+
+# ==============================================================================
+# Response Cache
+# ==============================================================================
+
+# Answers to repeated questions, per conversation and memory setting, kept for an hour
+RESPONSE_CACHE: TTLCache = TTLCache(maxsize=1024, ttl=3600)
+
+# Questions about live data or that create something are always run fresh
+UNCACHEABLE_QUESTION = re.compile(
+    r"\b(search|latest|news|today|now|current|weather|price|image|picture|draw|"
+    r"generate|speech|audio|voice|pdf|file|website|youtube|remember)\b"
+)
+
+def response_cache_key(conversation_id: str, question: str, use_memory: bool) -> Optional[bytes]:
+    """Hash of the normalized question, or None if it shouldn't be cached"""
+    normalized = " ".join(question.lower().split())
+    if UNCACHEABLE_QUESTION.search(normalized):
+        return None
+    # Personal questions ("what's my favorite color?") depend on memory that
+    # changes as the user tells the agent things - always ask the crew
+    if PERSONAL_WORDS.search(normalized):
+        return None
+    key = f"{conversation_id}\n{use_memory}\n{normalized}"
+    return hashlib.blake2b(key.encode(), digest_size=16).digest()
+
+# ==============================================================================
+# Query Router (skip the full crew for simple questions)
+# ==============================================================================
+
+# Set QUERY_ROUTER_ENABLED=false to send every question through the full crew
+QUERY_ROUTER_ENABLED = os.getenv("QUERY_ROUTER_ENABLED", "true").lower() != "false"
+
+# "What is 12 * (3 + 4)?" - plain arithmetic only (no ** so no huge powers)
+CALC_QUESTION = re.compile(
+    r"^\s*(?:what\s+is|what's|calculate|compute)?\s*([\d\s.+\-*/()%]{3,100}?)\s*[?=]?\s*$",
+    re.IGNORECASE,
+)
+CALC_OPERATOR = re.compile(r"\d\s*[+\-*/%]\s*[\d(]")
+
+# Short general-knowledge questions ("What is photosynthesis?")
+CHEAP_QUESTION = re.compile(r"^\s*(?:(?:what|who|when|where|which)\s+(?:is|are|was|were)|define)\b")
+# ...but anything personal needs the agent's backstory and memory
+PERSONAL_WORDS = re.compile(r"\b(?:i|me|my|mine|we|our|you|your|yours|andy|edith|remember)\b")
+CHEAP_MAX_WORDS = 12
+
+# Small, deterministic LLM call for cheap questions (no crew, no memory)
+CHEAP_MODEL = "openai/gpt-4o-mini"
+CHEAP_MAX_TOKENS = 64
+
+def cheap_answer(question: str) -> Optional[str]:
+    """Answer a cheap question directly, or None if the answer was cut off"""
+    response = litellm.completion(
+        model=CHEAP_MODEL,
+        temperature=0,
+        max_tokens=CHEAP_MAX_TOKENS,
+        messages=[
+            {"role": "system", "content": "Answer the question briefly and accurately."},
+            {"role": "user", "content": question},
+        ],
+    )
+    choice = response.choices[0]
+    # Hit max_tokens - the question needs a longer answer than this route gives
+    if choice.finish_reason == "length":
+        return None
+    return choice.message.content or ""
+
+def classify(question: str) -> str:
+    """Pick a route for a question: "calc", "cheap" or "full" (the crew)"""
+    match = CALC_QUESTION.match(question)
+    if match and "**" not in match.group(1) and CALC_OPERATOR.search(match.group(1)):
+        return "calc"
+    
+    normalized = " ".join(question.lower().split())
+    if (
+        len(normalized.split()) <= CHEAP_MAX_WORDS
+        and "@" not in normalized
+        and CHEAP_QUESTION.match(normalized)
+        and not PERSONAL_WORDS.search(normalized)
+        and not UNCACHEABLE_QUESTION.search(normalized)
+    ):
+        return "cheap"
+    
+    return "full"
+
+async def run_query(conversation_id: str, question: str, use_memory: bool = True) -> str:
+    """Answer a question: router shortcut, response cache, then the conversation's crew"""
+    route = classify(question) if QUERY_ROUTER_ENABLED else "full"
+    
+    if route == "calc":
+        expression = CALC_QUESTION.match(question).group(1).strip()
+        result = calculator_tool._run(expression)
+        if result.startswith("Result: "):
+            return f"{expression} = {result[len('Result: '):]}"
+        route = "full"  # e.g. division by zero - let the agent explain
+    
+    cache_key = response_cache_key(conversation_id, question, use_memory)
+    if cache_key is not None and (answer := RESPONSE_CACHE.get(cache_key)) is not None:
+        return answer
+    
+    if route == "cheap":
+        async with inflight_queries:
+            answer = await asyncio.to_thread(cheap_answer, question)
+        if answer is not None:
+            if cache_key is not None:
+                RESPONSE_CACHE[cache_key] = answer
+            return answer
+        # Truncated - never return (or cache) half an answer, ask the crew instead
+    
+    # Reuse this conversation's crew (memory stays warm between queries)
+    async with conversation_slot((conversation_id, use_memory)):
+        # An identical query may have finished while we waited for the lock
+        if cache_key is not None and (answer := RESPONSE_CACHE.get(cache_key)) is not None:
+            return answer
+        
+        crew = await get_query_crew(conversation_id, use_memory)
+        # Run the blocking crew in a worker thread so the event loop stays free
+        result = await asyncio.to_thread(crew.kickoff, inputs={"question": question})
+        answer = str(result.raw)
+        
+        if cache_key is not None:
+            RESPONSE_CACHE[cache_key] = answer
+    return answer
+
+# ==============================================================================
+# Token Streaming
+# ==============================================================================
+
+# id(crew LLM) -> callback receiving each streamed text chunk
+STREAM_SINKS: Dict[int, Any] = {}
+
+@crewai_event_bus.on(LLMStreamChunkEvent)
+def forward_stream_chunk(source, event):
+    """Hand streamed LLM tokens to the /query/stream request waiting on that LLM"""
+    sink = STREAM_SINKS.get(id(source))
+    if sink:
+        sink(event.chunk)
+
+# The agent's ReAct loop streams every step ("Thought:", "Action:", "Observation:")
+# before it writes this marker - only the text after it is the answer
+FINAL_ANSWER_MARKER = "Final Answer:"
+
+class FinalAnswerFilter:
+    """Passes on only the streamed text that comes after the Final Answer marker"""
+
+    def __init__(self):
+        self._buffer = ""
+        self._answering = False
+        self._started = False
+
+    def feed(self, chunk: str) -> str:
+        """Return the part of a chunk that belongs to the final answer ("" if none)"""
+        if not self._answering:
+            self._buffer += chunk
+            marker = self._buffer.find(FINAL_ANSWER_MARKER)
+            if marker == -1:
+                # Keep just enough to spot a marker split across chunks
+                self._buffer = self._buffer[-len(FINAL_ANSWER_MARKER):]
+                return ""
+            self._answering = True
+            chunk = self._buffer[marker + len(FINAL_ANSWER_MARKER):]
+        if not self._started:
+            chunk = chunk.lstrip()
+            self._started = bool(chunk)
+        return chunk
+
+def sse_event(payload: Dict[str, Any]) -> str:
+    """Format one Server-Sent Event"""
+    return f"data: {json.dumps(payload)}\n\n"
+
+# ==============================================================================
+# Shared HTTP Client (registry, AgentFacts DB, other agents)
+# ==============================================================================
+
+# One pooled HTTP/2 client for the whole process - repeat calls to the same
+# host reuse the open connection instead of a new TCP + TLS handshake each time
+A2A_CLIENT = httpx.AsyncClient(
+    http2=True,
+    timeout=30.0,
+    limits=httpx.Limits(max_keepalive_connections=100, max_connections=200),
+)
+
+# (agent_url, conversation_id, message) -> request in flight
+A2A_IN_FLIGHT: Dict[tuple[str, str, str], asyncio.Future] = {}
+
+async def post_a2a_message(agent_url: str, message: str, conversation_id: str) -> str:
+    """
+    POST a message to an agent's /a2a endpoint and return its reply text
+    
+    Identical messages sent while one is already in flight share that request.
+    Raises httpx errors to the caller.
+    """
+    async def send() -> str:
+        response = await A2A_CLIENT.post(
+            agent_url,
+            json={
+                "content": {
+                    "text": message,
+                    "type": "text"
+                },
+                "role": "user",
+                "conversation_id": conversation_id
+            }
+        )
+        response.raise_for_status()
+        data = response.json()
+        return data.get("content", {}).get("text", str(data))
+    
+    key = (agent_url, conversation_id, message)
+    future = A2A_IN_FLIGHT.get(key)
+    if future is None:
+        future = asyncio.ensure_future(send())
+        A2A_IN_FLIGHT[key] = future
+        future.add_done_callback(lambda _: A2A_IN_FLIGHT.pop(key, None))
+    # shield: one caller disconnecting doesn't cancel the others' request
+    return await asyncio.shield(future)
+
 # ==============================================================================
 # Registry Helper Functions
 # ==============================================================================
@@ -409,37 +907,36 @@ async def fetch_agents_from_registry():
     Updates the KNOWN_AGENTS dictionary with username -> A2A endpoint mappings
     """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(REGISTRY_URL)
-            response.raise_for_status()
-            data = response.json()
-            
-            # Handle both old and new API formats
-            agents = data.get("agents", [])
-            if not agents and isinstance(data, list):
-                # New API might return list directly
-                agents = data
+        response = await A2A_CLIENT.get(REGISTRY_URL, timeout=10.0)
+        response.raise_for_status()
+        data = response.json()
+        
+        # Handle both old and new API formats
+        agents = data.get("agents", [])
+        if not agents and isinstance(data, list):
+            # New API might return list directly
+            agents = data
+        
+        print(f"📥 Fetched {len(agents)} agents from registry")
+        
+        # Update KNOWN_AGENTS with username -> A2A endpoint mapping
+        for agent in agents:
+            # Support both old (username/url) and new (agent_id/endpoint) formats
+            username = agent.get("agent_id") or agent.get("username")
+            url = agent.get("endpoint") or agent.get("url", "")
             
-            print(f"📥 Fetched {len(agents)} agents from registry")
+            # Skip if no username or if it's this agent
+            if not username or username == MY_AGENT_USERNAME:
+                continue
             
-            # Update KNOWN_AGENTS with username -> A2A endpoint mapping
-            for agent in agents:
-                # Support both old (username/url) and new (agent_id/endpoint) formats
-                username = agent.get("agent_id") or agent.get("username")
-                url = agent.get("endpoint") or agent.get("url", "")
-                
-                # Skip if no username or if it's this agent
-                if not username or username == MY_AGENT_USERNAME:
-                    continue
-                
-                # Ensure URL ends with /a2a
-                if not url.endswith("/a2a"):
-                    url = url.rstrip("/") + "/a2a"
-                
-                KNOWN_AGENTS[username] = url
-                print(f"   ✅ Registered: @{username} -> {url}")
+            # Ensure URL ends with /a2a
+            if not url.endswith("/a2a"):
+                url = url.rstrip("/") + "/a2a"
             
-            return True
+            KNOWN_AGENTS[username] = url
+            print(f"   ✅ Registered: @{username} -> {url}")
+        
+        return True
     except Exception as e:
         print(f"⚠️ Failed to fetch agents from registry: {str(e)}")
         return False
@@ -466,21 +963,7 @@ async def send_message_to_agent(agent_id: str, message: str, conversation_id: st
     agent_url = KNOWN_AGENTS[agent_id]
     
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                agent_url,
-                json={
-                    "content": {
-                        "text": message,
-                        "type": "text"
-                    },
-                    "role": "user",
-                    "conversation_id": conversation_id
-                }
-            )
-            response.raise_for_status()
-            data = response.json()
-            return data.get("content", {}).get("text", str(data))
+        return await post_a2a_message(agent_url, message, conversation_id)
     
     except httpx.TimeoutException:
         return f"❌ Timeout connecting to agent '{agent_id}'"
@@ -541,17 +1024,16 @@ async def fetch_agentfacts_from_db() -> list[Dict[str, Any]]:
         List of agentfacts dictionaries
     """
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(AGENTFACTS_DB_URL)
-            response.raise_for_status()
-            agents = response.json()
-            
-            if isinstance(agents, list):
-                return agents
-            elif isinstance(agents, dict) and "agents" in agents:
-                return agents["agents"]
-            else:
-                return []
+        response = await A2A_CLIENT.get(AGENTFACTS_DB_URL, timeout=10.0)
+        response.raise_for_status()
+        agents = response.json()
+        
+        if isinstance(agents, list):
+            return agents
+        elif isinstance(agents, dict) and "agents" in agents:
+            return agents["agents"]
+        else:
+            return []
     except Exception as e:
         print(f"⚠️ Failed to fetch agentfacts from database: {str(e)}")
         return []
@@ -611,7 +1093,7 @@ If no agent is suitable, respond with:
     try:
         # Use the existing LLM to get the selection
         selection_llm = LLM(model="openai/gpt-4o-mini", temperature=0.3)
-        response = selection_llm.call(prompt)
+        response = await asyncio.to_thread(selection_llm.call, prompt)
         
         # Parse the response
         # Try to extract JSON from the response
@@ -660,21 +1142,7 @@ async def send_a2a_to_url(agent_url: str, message: str, conversation_id: str) ->
         Response from the agent
     """
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                agent_url,
-                json={
-                    "content": {
-                        "text": message,
-                        "type": "text"
-                    },
-                    "role": "user",
-                    "conversation_id": conversation_id
-                }
-            )
-            response.raise_for_status()
-            data = response.json()
-            return data.get("content", {}).get("text", str(data))
+        return await post_a2a_message(agent_url, message, conversation_id)
     
     except httpx.TimeoutException:
         return f"Timeout connecting to agent at {agent_url}"
@@ -755,8 +1223,8 @@ def generate_agent_facts() -> Dict[str, Any]:
             "modalities": [
                 "text"
             ],
-            # 🔵 Real-time streaming support
-            "streaming": False,
+            # 🔵 Real-time streaming support (POST /query/stream)
+            "streaming": True,
             # 🔵 Batch processing support
             "batch": False,
             # 🟢 Authentication methods (maps to AgentCard.securitySchemes & security)
@@ -831,7 +1299,9 @@ def generate_agent_facts() -> Dict[str, Any]:
                 "latency_p95_ms": 2000,
                 "throughput_rps": 10,
                 "error_rate": 0.01,
-                "availability": "99.0%"
+                "availability": "99.0%",
+                # Share of prompt tokens served from OpenAI's prompt cache (last 5 min)
+                "prompt_cache_hit_ratio": prompt_cache_hit_ratio()
             }
         },
         
@@ -851,53 +1321,96 @@ def generate_agent_facts() -> Dict[str, Any]:
 # API Endpoints
 # ==============================================================================
 
+# /health never changes - build and encode it once
+HEALTH_RESPONSE_BYTES = orjson.dumps(
+    HealthResponse(
+        status="healthy",
+        memory_enabled=True,
+        tools_count=TOOLS_COUNT,
+        a2a_enabled=True
+    ).model_dump()
+)
+
+# Encoded bodies for / and /agentfacts: {"version", "body", "etag"}
+ROOT_CACHE: Dict[str, Any] = {}
+AGENT_FACTS_CACHE: Dict[str, Any] = {}
+
+def cached_json_response(request: Request, cache: Dict[str, Any], version: Any, build) -> Response:
+    """
+    Serve JSON that only changes when `version` changes
+    
+    The body is encoded once per version and sent with an ETag, so clients
+    that send it back in If-None-Match get an empty 304 Not Modified.
+    """
+    if "body" not in cache or cache["version"] != version:
+        body = orjson.dumps(build())
+        cache.update(
+            version=version,
+            body=body,
+            etag=f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"',
+        )
+    
+    headers = {"ETag": cache["etag"], "Cache-Control": "public, max-age=60"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if cache["etag"] in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cache["body"], media_type="application/json", headers=headers)
+
+# Static part of / (known_agents is filled in when it changes)
+ROOT_INFO = {
+    "message": "🤖 Personal Agent Twin API with A2A - Day 4",
+    "version": "2.0.0",
+    "agent_id": MY_AGENT_ID,
+    "agent_name": MY_AGENT_NAME,
+    "agent_username": MY_AGENT_USERNAME,
+    "memory_enabled": True,
+    "tools_enabled": TOOLS_COUNT,
+    "a2a_enabled": True,
+    "known_agents": [],
+    "endpoints": {
+        "health": "GET /health",
+        "query": "POST /query",
+        "query_stream": "POST /query/stream (Server-Sent Events)",
+        "a2a": "POST /a2a",
+        "search": "POST /search (Auto-find and route to suitable agent)",
+        "agentfacts": "GET /agentfacts",
+        "agents": "GET /agents",
+        "metrics": "GET /metrics (Prometheus)",
+        "docs": "GET /docs"
+    }
+}
+
+def build_root_info() -> Dict[str, Any]:
+    """ROOT_INFO plus the current known agents"""
+    info = dict(ROOT_INFO)
+    info["known_agents"] = list(KNOWN_AGENTS.keys())
+    return info
+
 @app.get("/")
-async def root():
+async def root(request: Request):
     """Root endpoint - shows API information"""
-    return {
-        "message": "🤖 Personal Agent Twin API with A2A - Day 4",
-        "version": "2.0.0",
-        "agent_id": MY_AGENT_ID,
-        "agent_name": MY_AGENT_NAME,
-        "agent_username": MY_AGENT_USERNAME,
-        "memory_enabled": True,
-        "tools_enabled": len(available_tools),
-        "a2a_enabled": True,
-        "known_agents": list(KNOWN_AGENTS.keys()),
-        "endpoints": {
-            "health": "GET /health",
-            "query": "POST /query",
-            "a2a": "POST /a2a",
-            "search": "POST /search (Auto-find and route to suitable agent)",
-            "agentfacts": "GET /agentfacts",
-            "agents": "GET /agents",
-            "docs": "GET /docs"
-        }
-    }
+    # Only changes as agents register
+    return cached_json_response(request, ROOT_CACHE, tuple(KNOWN_AGENTS), build_root_info)
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint"""
-    return HealthResponse(
-        status="healthy",
-        memory_enabled=True,
-        tools_count=len(available_tools),
-        a2a_enabled=True
-    )
+    return Response(content=HEALTH_RESPONSE_BYTES, media_type="application/json")
 
 @app.get("/agents")
 async def list_agents():
     """List known agents for A2A communication"""
-    return {
+    # Plain dict of strings - hand it straight to orjson
+    return ORJSONResponse({
         "my_agent_id": MY_AGENT_ID,
         "my_agent_name": MY_AGENT_NAME,
         "my_agent_username": MY_AGENT_USERNAME,
         "known_agents": KNOWN_AGENTS,
         "usage": "Send messages using @agent-id syntax in the /a2a endpoint"
-    }
+    })
 
 @app.get("/agentfacts")
-async def get_agent_facts():
+async def get_agent_facts(request: Request):
     """
     Get AgentFacts (NANDA Schema)
     
@@ -917,7 +1430,8 @@ async def get_agent_facts():
     Note: In NANDA, this is similar to /.well-known/agent-card.json
     but with extended metadata for agent mesh networks.
     """
-    return generate_agent_facts()
+    # Only the prompt cache hit ratio changes between builds
+    return cached_json_response(request, AGENT_FACTS_CACHE, prompt_cache_hit_ratio(), generate_agent_facts)
 
 @app.post("/query", response_model=QueryResponse)
 async def query_agent(request: QueryRequest):
@@ -927,49 +1441,110 @@ async def query_agent(request: QueryRequest):
     This is the standard query endpoint - no A2A routing.
     For A2A communication, use the /a2a endpoint instead.
     """
-    start_time = datetime.now()
+    start_ns = time.perf_counter_ns()
+    conversation_id = request.conversation_id or "default"
     
     try:
-        # Create task for this query
-        task = Task(
-            description=f"""
-            Answer the following question: {request.question}
-            
-            Use your memory to recall relevant context.
-            Use your tools when you need external information or calculations.
-            Provide accurate, helpful responses.
-            """,
-            expected_output="A clear, context-aware answer using memory and tools as needed",
-            agent=my_agent_twin,
-        )
+        answer = await run_query(conversation_id, request.question, request.use_memory)
         
-        # Create crew with memory enabled
-        crew = Crew(
-            agents=[my_agent_twin],
-            tasks=[task],
-            memory=True,
-            verbose=False,
-        )
-        
-        # Execute the crew
-        result = crew.kickoff()
-        
-        # Calculate processing time
-        end_time = datetime.now()
-        processing_time = (end_time - start_time).total_seconds()
+        # Calculate processing time (monotonic clock; wall clock only for the timestamp)
+        processing_time = (time.perf_counter_ns() - start_ns) / 1e9
         
         return QueryResponse(
-            answer=str(result.raw),
-            timestamp=end_time.isoformat(),
+            answer=answer,
+            timestamp=datetime.now(timezone.utc),
             processing_time=processing_time
         )
         
+    except HTTPException:
+        # Re-raise HTTP exceptions (like 429 when a conversation is busy)
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error processing query: {str(e)}"
         )
 
+@app.post("/query/stream")
+async def query_agent_stream(request: QueryRequest):
+    """
+    Same as /query, but streams the answer as Server-Sent Events
+    
+    Events (each line is "data: {json}"):
+        {"type": "token", "content": "..."}      - as the LLM writes the final answer
+        {"type": "done", "answer": "...", ...}   - final answer + timing
+        {"type": "error", "detail": "..."}       - if the query failed
+    """
+    conversation_id = request.conversation_id or "default"
+    key = (conversation_id, request.use_memory)
+    loop = asyncio.get_running_loop()
+    
+    # Reject bursts with a real 429 before the stream (and its 200 status) starts
+    if conversation_is_full(key):
+        raise HTTPException(
+            status_code=429,
+            detail="Too many queries queued for this conversation - retry shortly"
+        )
+    
+    async def event_stream():
+        start_ns = time.perf_counter_ns()
+        tokens: asyncio.Queue = asyncio.Queue()
+        
+        async def run_crew():
+            # Runs as its own task: if the client disconnects, the crew keeps
+            # the conversation lock and in-flight slot until kickoff() returns
+            async with conversation_slot(key):
+                crew = await get_query_crew(conversation_id, request.use_memory)
+                stream_llm = crew.agents[0].llm
+                answer_filter = FinalAnswerFilter()
+                
+                def forward(chunk):
+                    # Chunks arrive on the worker thread - pass the answer text
+                    # back to the event loop
+                    text = answer_filter.feed(chunk)
+                    if text:
+                        loop.call_soon_threadsafe(tokens.put_nowait, text)
+                
+                # Pooled crews don't stream; the conversation lock means no
+                # /query run can use this crew until we switch it back off
+                stream_llm.stream = True
+                STREAM_SINKS[id(stream_llm)] = forward
+                try:
+                    return await asyncio.to_thread(crew.kickoff, inputs={"question": request.question})
+                finally:
+                    STREAM_SINKS.pop(id(stream_llm), None)
+                    stream_llm.stream = False
+        
+        def crew_done(job):
+            if not job.cancelled():
+                job.exception()  # Mark as retrieved - `await job` below re-raises it
+            tokens.put_nowait(None)
+        
+        job = asyncio.ensure_future(run_crew())
+        job.add_done_callback(crew_done)
+        
+        try:
+            while (chunk := await tokens.get()) is not None:
+                yield sse_event({"type": "token", "content": chunk})
+            
+            result = await job
+            yield sse_event({
+                "type": "done",
+                "answer": str(result.raw),
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "processing_time": (time.perf_counter_ns() - start_ns) / 1e9,
+            })
+        except HTTPException as e:
+            yield sse_event({"type": "error", "detail": e.detail})
+        except Exception as e:
+            yield sse_event({"type": "error", "detail": f"Error processing query: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.post("/a2a", response_model=A2AResponse)
 async def a2a_endpoint(message: A2AMessage):
     """
@@ -1035,8 +1610,6 @@ async def a2a_endpoint(message: A2AMessage):
         # Log successful routing
         a2a_logger.info(f"SUCCESS | conversation_id={conversation_id} | target={target_agent} | response_length={len(agent_response)}")
         
-        end_time = datetime.now()
-        
         return A2AResponse(
             content={
                 "text": response_text,
@@ -1044,7 +1617,7 @@ async def a2a_endpoint(message: A2AMessage):
             },
             role="assistant",
             conversation_id=conversation_id,
-            timestamp=end_time.isoformat(),
+            timestamp=datetime.now(timezone.utc),
             agent_id=MY_AGENT_ID
         )
         
@@ -1094,7 +1667,7 @@ async def search_and_route(request: SearchRequest):
     The LLM will analyze the query and select the most suitable agent
     from the database, then route the message to that agent.
     """
-    start_time = datetime.now()
+    start_ns = time.perf_counter_ns()
     
     try:
         # Step 1: Fetch all agentfacts from database
@@ -1149,8 +1722,7 @@ async def search_and_route(request: SearchRequest):
         agent_response = await send_a2a_to_url(agent_url, request.query, request.conversation_id)
         
         # Calculate processing time
-        end_time = datetime.now()
-        processing_time = (end_time - start_time).total_seconds()
+        processing_time = (time.perf_counter_ns() - start_ns) / 1e9
         
         return SearchResponse(
             selected_agent={
@@ -1160,7 +1732,7 @@ async def search_and_route(request: SearchRequest):
                 "endpoint": agent_url
             },
             agent_response=agent_response,
-            timestamp=end_time.isoformat(),
+            timestamp=datetime.now(timezone.utc),
             processing_time=processing_time
         )
         
@@ -1179,6 +1751,11 @@ async def search_and_route(request: SearchRequest):
 @app.on_event("startup")
 async def startup_event():
     """Run when the API starts"""
+    # Bounded pool used by asyncio.to_thread for crew.kickoff() and LLM calls
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=CREW_THREADS, thread_name_prefix="crew")
+    )
+    
     print("\n" + "="*70)
     print("🚀 Personal Agent Twin API with A2A Starting...")
     print("="*70)
@@ -1187,21 +1764,34 @@ async def startup_event():
     print(f"✅ Agent Username: {MY_AGENT_USERNAME}")
     print(f"✅ Model: {llm.model}")
     print("✅ Memory: Enabled (4 types)")
-    print(f"✅ Tools: {len(available_tools)} tools loaded")
+    print(f"✅ Tools: {TOOLS_COUNT} tools loaded")
     print("✅ A2A: Enabled (NANDA-style)")
+    print(f"✅ Crew Threads: {CREW_THREADS} (max {MAX_INFLIGHT_QUERIES} queries in flight)")
+    print(f"✅ Query Router: {'Enabled' if QUERY_ROUTER_ENABLED else 'Disabled'}")
     
     # Fetch agents from central registry
     print(f"\n🔍 Fetching agents from registry: {REGISTRY_URL}")
     await fetch_agents_from_registry()
     print(f"✅ Known Agents: {len(KNOWN_AGENTS)}")
     
+    # Build the default conversation's crew now so the first /query doesn't
+    # pay for agent/task/crew validation and memory setup
+    await get_query_crew("default")
+    print("✅ Default crew ready")
+    
     print("\n📚 Documentation: http://localhost:8000/docs")
     print("🤖 A2A Endpoint: http://localhost:8000/a2a")
+    print("📡 Streaming Query: http://localhost:8000/query/stream")
     print("📋 AgentFacts: http://localhost:8000/agentfacts")
     if PUBLIC_URL:
         print(f"🌐 Public URL: {PUBLIC_URL}")
     print("="*70 + "\n")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Run when the API stops"""
+    await A2A_CLIENT.aclose()
+
 # ==============================================================================
 # Run Instructions
 # ==============================================================================
@@ -1215,6 +1805,11 @@ LOCAL TESTING:
       -H "Content-Type: application/json" \\
       -d '{"question": "What is 50 * 50?"}'
     
+    # Streaming query (tokens arrive as Server-Sent Events)
+    curl -N -X POST http://localhost:8000/query/stream \\
+      -H "Content-Type: application/json" \\
+      -d '{"question": "Tell me about yourself"}'
+    
     # A2A message (local)
     curl -X POST http://localhost:8000/a2a \\
       -H "Content-Type: application/json" \\
@@ -1229,17 +1824,34 @@ LOCAL TESTING:
     curl -X POST "http://localhost:8000/agents/register?agent_id=test-agent&agent_url=http://example.com/a2a"
 
 RAILWAY DEPLOYMENT:
-    Railway automatically detects and runs this with:
-    uvicorn main:app --host 0.0.0.0 --port $PORT
+    Railway runs this with (see railway.json):
+    uvicorn main:app --host 0.0.0.0 --port $PORT --workers 1 --loop uvloop --http httptools
     
     Set environment variables:
     - OPENAI_API_KEY (required)
     - AGENT_ID (optional, default: "personal-agent-twin")
     - AGENT_NAME (optional, default: "Personal Agent Twin")
     - SERPER_API_KEY (optional, for web search)
+    - QUERY_ROUTER_ENABLED (optional, "false" sends every /query through the full crew)
+    - WEB_CONCURRENCY (optional, worker processes for `python main.py`, default: 1)
+    
+    Each worker process has its own KNOWN_AGENTS, crews and response cache,
+    so agents registered via /agents/register are only seen by one worker.
+    Keep 1 worker unless you move that state out of process.
 """
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    workers = int(os.getenv("WEB_CONCURRENCY", 1))
+    uvicorn.run(
+        # One worker: serve this module's app (an import string would import
+        # main a second time and register the metrics/log handlers twice).
+        # Multiple workers need the import string so each process loads it.
+        app if workers == 1 else "main:app",
+        host="0.0.0.0",
+        port=port,
+        workers=workers,
+        loop="auto",  # uvloop when installed (uvicorn[standard]; not on Windows)
+        http="auto",  # httptools when installed
+    )
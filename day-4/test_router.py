@@ -0,0 +1,71 @@
+"""
+Tests for the query router's cheap route
+
+These call run_query() directly with the LLM and crew faked out, so they
+don't need a running agent or an OpenAI key:
+    pytest test_router.py -v
+"""
+
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+
+# The RAG tools are built at import time and only need a key to be present
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+import main
+
+QUESTION = "What is photosynthesis?"
+
+
+def completion(content, finish_reason):
+    """Minimal stand-in for a litellm completion response"""
+    return SimpleNamespace(choices=[
+        SimpleNamespace(finish_reason=finish_reason, message=SimpleNamespace(content=content))
+    ])
+
+
+@pytest.fixture
+def crew_calls(monkeypatch):
+    """Replace the conversation crew with one that records its questions"""
+    calls = []
+
+    def kickoff(inputs):
+        calls.append(inputs["question"])
+        return SimpleNamespace(raw="Full crew answer")
+
+    async def get_query_crew(conversation_id, use_memory=True):
+        return SimpleNamespace(kickoff=kickoff)
+
+    monkeypatch.setattr(main, "get_query_crew", get_query_crew)
+    monkeypatch.setattr(main, "QUERY_ROUTER_ENABLED", True)
+    main.RESPONSE_CACHE.clear()
+    yield calls
+    main.RESPONSE_CACHE.clear()
+
+
+def test_question_takes_cheap_route():
+    assert main.classify(QUESTION) == "cheap"
+
+
+def test_cheap_answer_is_returned_and_cached(monkeypatch, crew_calls):
+    monkeypatch.setattr(main.litellm, "completion", lambda **kwargs: completion("Plants making food from light.", "stop"))
+
+    answer = asyncio.run(main.run_query("router-test", QUESTION))
+
+    assert answer == "Plants making food from light."
+    assert crew_calls == []
+    assert list(main.RESPONSE_CACHE.values()) == [answer]
+
+
+def test_truncated_cheap_answer_falls_back_to_crew(monkeypatch, crew_calls):
+    """An answer cut off at max_tokens is neither returned nor cached"""
+    monkeypatch.setattr(main.litellm, "completion", lambda **kwargs: completion("Photosynthesis is the process by which", "length"))
+
+    answer = asyncio.run(main.run_query("router-test", QUESTION))
+
+    assert answer == "Full crew answer"
+    assert crew_calls == [QUESTION]
+    assert list(main.RESPONSE_CACHE.values()) == ["Full crew answer"]